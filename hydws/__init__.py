@@ -1,9 +1,13 @@
 import contextlib
-import io
 import logging
 
 import requests
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads  # noqa: F401
+
 logger = logging.getLogger(__name__)
 
 
@@ -20,10 +24,10 @@ class ClientError(RequestsError):
 
 
 @contextlib.contextmanager
-def binary_request(request, url, params={}, timeout=None,
+def binary_request(request, url, params=None, timeout=None,
                    nocontent_codes=(204,), **kwargs):
     """
-    Make a binary request
+    Make a binary request, streaming the response body
 
     :param request: Request object to be used
     :type request: :py:class:`requests.Request`
@@ -32,19 +36,23 @@ def binary_request(request, url, params={}, timeout=None,
     :param timeout: Request timeout
     :type timeout: None or int or tuple
 
-    :rtype: io.BytesIO
+    :rtype: :py:class:`urllib3.response.HTTPResponse`
     """
+    kwargs.setdefault('stream', True)
     try:
         r = request(url, params=params, timeout=timeout, **kwargs)
-        print("request", r, type(r))
-        if r.status_code in nocontent_codes:
-            raise NoContent(r.url, r.status_code, response=r)
+        try:
+            if r.status_code in nocontent_codes:
+                raise NoContent(r.url, r.status_code, response=r)
 
-        r.raise_for_status()
-        if r.status_code != 200:
-            raise ClientError(r.status_code, response=r)
+            r.raise_for_status()
+            if r.status_code != 200:
+                raise ClientError(r.status_code, response=r)
 
-        yield io.BytesIO(r.content)
+            r.raw.decode_content = True
+            yield r.raw
+        finally:
+            r.close()
 
     except (NoContent, ClientError) as err:
         raise err
@@ -52,7 +60,7 @@ def binary_request(request, url, params={}, timeout=None,
         raise RequestsError(err, response=err.response)
 
 
-def make_request(request, url, params={}, timeout=None,
+def make_request(request, url, params=None, timeout=None,
                  nocontent_codes=(204,), **kwargs):
     """
     Make a normal request
@@ -70,7 +78,7 @@ def make_request(request, url, params={}, timeout=None,
     try:
         r = request(url, params=params, timeout=timeout, **kwargs)
 
-        logger.debug(f'Making request to {url} with parameters {params}')
+        logger.debug('Making request to %s with parameters %s', url, params)
 
         if r.status_code in nocontent_codes:
             raise NoContent(r.url, r.status_code, response=r)
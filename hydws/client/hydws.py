@@ -1,14 +1,78 @@
-import json
 import logging
+import re
+import threading
+import time
 import uuid
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 
-from hydws import NoContent, RequestsError, make_request
+from hydws import NoContent, RequestsError, json_loads, make_request
 from hydws.parser import SectionHydraulics
 
+try:
+    import requests_cache
+except ImportError:
+    requests_cache = None
+
+_UUID_RE = re.compile(
+    r'\A[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-'
+    r'[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\Z')
+_HEX_RE = re.compile(r'\A[0-9a-fA-F]{32}\Z')
+
+
+def _identifier_key(identifier: str) -> str:
+    """
+    Returns the metadata key an identifier refers to, 'publicid' for
+    UUIDs and 'name' otherwise.
+    """
+    # the regex covers the usual hyphenated form, uuid.UUID the others
+    # it accepts, e.g. plain hex digits, braces or a 'urn:uuid:' prefix;
+    # names are mostly rejected by the cheap length check before that
+    if _UUID_RE.match(identifier):
+        return 'publicid'
+    digits = identifier.replace('urn:', '').replace('uuid:', '') \
+        .strip('{}').replace('-', '')
+    if len(digits) != 32 or not _HEX_RE.match(digits):
+        return 'name'
+    try:
+        uuid.UUID(identifier)
+    except ValueError:
+        return 'name'
+    return 'publicid'
+
+
+def _format_datetime(value: datetime) -> str:
+    """
+    Formats a datetime as UTC query parameter, e.g. '2024-04-06T01:00:00'.
+    Naive datetimes are taken to be in UTC already.
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat(timespec='seconds')
+
+
+def _as_columns(items: list[dict]) -> dict[str, list[str]]:
+    """
+    Returns the names and publicids of boreholes or sections as columns.
+    """
+    return {'name': [item.get('name') for item in items],
+            'publicid': [item['publicid'] for item in items]}
+
+
+def _is_historical(endtime: datetime, delay: timedelta) -> bool:
+    """
+    Returns whether a time window ending at endtime lies further than delay
+    in the past, so that its data is not expected to change anymore.
+    """
+    now = datetime.now(timezone.utc)
+    if endtime.tzinfo is None:
+        now = now.replace(tzinfo=None)
+    return endtime < now - delay
+
 
 class HYDWSDataSource:
     """
@@ -17,23 +81,113 @@ class HYDWSDataSource:
 
     def __init__(self,
                  url: str,
-                 timeout: int = None) -> None:
+                 timeout: int = None,
+                 pool_maxsize: int = 10,
+                 metadata_ttl: float | None = None,
+                 cache: str | None = None,
+                 cache_delay: timedelta = timedelta(days=1)) -> None:
         """
         Initialize Class.
-        :param url:     URL of the hydrological webservice
-        :param timeout: after how long, contacting the webservice should
-                        be aborted
+        :param url:          URL of the hydrological webservice
+        :param timeout:      after how long, contacting the webservice should
+                             be aborted
+        :param pool_maxsize: maximum number of connections kept open to the
+                             webservice.
+        :param metadata_ttl: seconds after which the borehole metadata is
+                             fetched again, never if None.
+        :param cache:        path of a SQLite file in which hydraulic data of
+                             past time windows is cached. Requires the
+                             'requests-cache' package.
+        :param cache_delay:  only time windows ending longer than this ago
+                             are cached.
         """
         self.url = url
+        self._boreholes_url = f'{url}/boreholes'
         self._timeout = timeout
+        self._pool_maxsize = pool_maxsize
+        self._metadata_ttl = metadata_ttl
+        self._metadata_lock = threading.Lock()
+        self._cache = cache
+        self._cache_delay = cache_delay
         self.logger = logging.getLogger(__name__)
 
-        self.metadata = self._make_api_request(f'{self.url}/boreholes')
+        if cache is None:
+            self._session = requests.Session()
+        elif requests_cache is None:
+            raise ImportError(
+                "Caching requires the 'requests-cache' package.")
+        else:
+            self._session = requests_cache.CachedSession(
+                cache, backend='sqlite',
+                expire_after=requests_cache.DO_NOT_CACHE)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+        self._load_metadata()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Closes the connections kept open to the webservice.
+        """
+        self._session.close()
+
+    def _load_metadata(self) -> None:
+        """
+        Fetches the borehole metadata and indexes it by name and publicid.
+        """
+        metadata = self._make_api_request(self._boreholes_url)
+
+        # build the new indexes first and publish them in one go, so
+        # lookups running meanwhile only ever see complete indexes
+        boreholes = {
+            key: {bh[key]: bh for bh in metadata or [] if key in bh}
+            for key in ('name', 'publicid')}
+        borehole_columns = _as_columns(metadata or [])
+
+        (self._boreholes, self._borehole_columns, self._sections,
+         self._section_columns, self.metadata, self._metadata_time) = \
+            (boreholes, borehole_columns, {}, {}, metadata,
+             time.monotonic())
+
+    def _refresh_metadata(self) -> None:
+        """
+        Fetches the borehole metadata again if it is older than the TTL.
+        """
+        if self._metadata_ttl is None:
+            return
+        with self._metadata_lock:
+            if time.monotonic() - self._metadata_time > self._metadata_ttl:
+                self._load_metadata()
+
+    def _section_index(self, borehole_metadata: dict) -> dict:
+        """
+        Returns the sections of a borehole indexed by name and publicid.
+        """
+        # indexes are cached together with the borehole they were built
+        # from, a lookup racing a refresh can't mix old and new metadata
+        cached = self._sections.get(borehole_metadata['publicid'])
+
+        if cached is None or cached[0] is not borehole_metadata:
+            cached = (borehole_metadata, {
+                key: {sc[key]: sc for sc in borehole_metadata['sections']
+                      if key in sc}
+                for key in ('name', 'publicid')})
+            self._sections[borehole_metadata['publicid']] = cached
+
+        return cached[1]
 
     def list_boreholes(self) -> list:
         """
         Returns a list of all boreholes including their metadata and sections.
         """
+        self._refresh_metadata()
         return self.metadata
 
     def list_borehole_names(self, identifier: str = 'name') \
@@ -44,10 +198,13 @@ class HYDWSDataSource:
 
         :returns: List of tuples with borehole name and id.
         """
+        self._refresh_metadata()
+        columns = self._borehole_columns
+
         if identifier == 'both':
-            return [(bh['name'], bh['publicid']) for bh in self.metadata]
+            return list(zip(columns['name'], columns['publicid']))
         else:
-            return [bh[identifier] for bh in self.metadata]
+            return list(columns[identifier])
 
     def get_borehole_metadata(self, borehole: str) -> dict:
         """
@@ -56,15 +213,10 @@ class HYDWSDataSource:
         :param borehole_id: PublicID or name of the borehole.
         :returns:           Borehole data as a dict.
         """
+        self._refresh_metadata()
 
-        try:
-            uuid.UUID(borehole)
-            key = 'publicid'
-        except ValueError:
-            key = 'name'
-
-        borehole_metadata = next(
-            (bh for bh in self.metadata if bh[key] == borehole), None)
+        borehole_metadata = \
+            self._boreholes[_identifier_key(borehole)].get(borehole)
 
         if not borehole_metadata:
             raise KeyError(f'Borehole {borehole} could not be found.')
@@ -96,11 +248,17 @@ class HYDWSDataSource:
 
         borehole_metadata = self.get_borehole_metadata(borehole)
 
+        cached = self._section_columns.get(borehole_metadata['publicid'])
+        if cached is None or cached[0] is not borehole_metadata:
+            cached = (borehole_metadata,
+                      _as_columns(borehole_metadata['sections']))
+            self._section_columns[borehole_metadata['publicid']] = cached
+        columns = cached[1]
+
         if identifier == 'both':
-            return [(sc['name'], sc['publicid'])
-                    for sc in borehole_metadata['sections']]
+            return list(zip(columns['name'], columns['publicid']))
         else:
-            return [sc[identifier] for sc in borehole_metadata['sections']]
+            return list(columns[identifier])
 
     def get_section_metadata(self, borehole: str, section: str) -> dict:
         """
@@ -111,76 +269,92 @@ class HYDWSDataSource:
         :returns:        Metadata for the section.
         """
 
-        borehole_metadata = self.get_borehole_metadata(borehole)
-
-        try:
-            uuid.UUID(section)
-            key = 'publicid'
-        except ValueError:
-            key = 'name'
-
-        section_metadata = next(
-            (sc for sc in borehole_metadata['sections']
-             if sc[key] == section), None)
-
-        if not section_metadata:
-            raise KeyError(f'Section {section} could not be found.')
-
-        return section_metadata
+        return self._resolve(borehole, section)[1]
 
     def get_borehole(self, borehole: str,
                      starttime: datetime = datetime(1990, 1, 1),
-                     endtime: datetime = datetime.now()) -> dict:
+                     endtime: datetime | None = None) -> dict:
         """
         Returns borehole with all the sections and associated hydraulic data.
 
         :param borehole_id: PublicID or name of the borehole.
         :param starttime:   Datetime from when on the data should be retrieved.
-        :param endtime:     Datetime until when the data should be retrieved.
+        :param endtime:     Datetime until when the data should be retrieved,
+                            defaults to now.
 
         :returns: Borehole and section metadata as well as section hydraulics.
         """
         borehole_id = self._get_borehole_id(borehole)
+        endtime = endtime or datetime.now(timezone.utc)
 
-        request_url = f'{self.url}/boreholes/{borehole_id}'
+        request_url = f'{self._boreholes_url}/{borehole_id}'
 
         params = {
-            'starttime': starttime.strftime("%Y-%m-%dT%H:%M:%S"),
-            'endtime': endtime.strftime("%Y-%m-%dT%H:%M:%S"),
+            'starttime': _format_datetime(starttime),
+            'endtime': _format_datetime(endtime),
             'level': 'hydraulic'}
 
-        metadata = self._make_api_request(request_url, params)
+        metadata = self._make_api_request(
+            request_url, params, **self._cache_kwargs(endtime))
 
         return metadata
 
     def get_section(self, borehole: str,
                     section: str,
                     starttime: datetime,
-                    endtime: datetime = datetime.now()) -> dict:
+                    endtime: datetime | None = None) -> dict:
         """
         Returns Section data including hydraulics.
 
         :param borehole_id: PublicID or name of the borehole.
         :param section_id:  PublicID or name of the section.
         :param starttime:   Datetime from when on the data should be retrieved.
-        :param endtime:     Datetime until when the data should be retrieved.
+        :param endtime:     Datetime until when the data should be retrieved,
+                            defaults to now.
 
         :returns: Section metadata as well as section hydraulics.
         """
-        borehole_id = self._get_borehole_id(borehole)
-        section_id = self._get_section_id(borehole_id, section)
-
-        section_metadata = self.get_section_metadata(borehole_id, section_id)
+        borehole_id, section_metadata = self._resolve(borehole, section)
         section_hydraulics = self.get_section_hydraulics(
-            borehole_id, section_id, starttime, endtime)
+            borehole_id, section_metadata['publicid'], starttime, endtime)
+
+        return {**section_metadata, 'hydraulics': section_hydraulics}
+
+    def get_sections(self, borehole: str,
+                     sections: list[str],
+                     starttime: datetime,
+                     endtime: datetime | None = None,
+                     max_workers: int | None = None) -> list[dict]:
+        """
+        Returns Section data including hydraulics for multiple sections.
 
-        section_metadata['hydraulics'] = section_hydraulics
-        return section_metadata
+        The sections are requested concurrently, sharing the connection
+        pool of the data source.
+
+        :param borehole:    PublicID or name of the borehole.
+        :param sections:    List of PublicIDs or names of the sections.
+        :param starttime:   Datetime from when on the data should be retrieved.
+        :param endtime:     Datetime until when the data should be retrieved,
+                            defaults to now.
+        :param max_workers: Maximum number of concurrent requests, defaults
+                            to the size of the connection pool.
+
+        :returns: List of section metadata as well as section hydraulics,
+                  in the order of the requested sections.
+        """
+        borehole_id = self._get_borehole_id(borehole)
+
+        with ThreadPoolExecutor(
+                max_workers=max_workers or self._pool_maxsize) as executor:
+            return list(executor.map(
+                lambda section: self.get_section(
+                    borehole_id, section, starttime, endtime),
+                sections))
 
     def get_section_hydraulics(self, borehole: str,
                                section: str,
                                starttime: datetime,
-                               endtime: datetime = datetime.now(),
+                               endtime: datetime | None = None,
                                format: str = 'json') -> list:
         """
         Get section hydraulics without any metadata.
@@ -188,98 +362,125 @@ class HYDWSDataSource:
         :param borehole:    PublicID or name of the borehole.
         :param section:     PublicID or name of the section.
         :param starttime:   Datetime from when on the data should be retrieved.
-        :param endtime:     Datetime until when the data should be retrieved.
+        :param endtime:     Datetime until when the data should be retrieved,
+                            defaults to now.
         :param format:      Format of the returned data, 'json' or 'pandas'.
 
         :returns: List of hydraulic samples for the specified parameters.
         """
         borehole_id = self._get_borehole_id(borehole)
         section_id = self._get_section_id(borehole_id, section)
+        endtime = endtime or datetime.now(timezone.utc)
 
         params = {
-            'starttime': starttime.strftime("%Y-%m-%dT%H:%M:%S"),
-            'endtime': endtime.strftime("%Y-%m-%dT%H:%M:%S")}
+            'starttime': _format_datetime(starttime),
+            'endtime': _format_datetime(endtime)}
 
         self.logger.info(
-            f"Request borehole / hydraulic data from hydws (url={self.url}, "
-            f"borehole={borehole_id}, section={section_id}, params={params}).")
+            "Request borehole / hydraulic data from hydws (url=%s, "
+            "borehole=%s, section=%s, params=%s).",
+            self.url, borehole_id, section_id, params)
 
         request_url = \
-            f'{self.url}/boreholes/{borehole_id}/' \
-            f'sections/{section_id}/hydraulics'
-
-        hydraulics = self._make_api_request(request_url, params)
+            f'{self._boreholes_url}/{borehole_id}/sections/{section_id}' \
+            '/hydraulics'
 
         if format == 'pandas':
-            if not hydraulics:
+            response = self._make_api_request_bytes(
+                request_url, params, **self._cache_kwargs(endtime))
+            if not response:
                 return pd.DataFrame()
-            return SectionHydraulics._load_hydraulic_json(hydraulics)
+            return SectionHydraulics._load_hydraulic_bytes(response)
+
+        hydraulics = self._make_api_request(
+            request_url, params, **self._cache_kwargs(endtime))
 
         if not hydraulics:
             return []
 
         return hydraulics
 
+    def _resolve(self, borehole: str, section: str) -> tuple[str, dict]:
+        """
+        Get the borehole ID and the section metadata in a single lookup.
+        """
+        borehole_metadata = self.get_borehole_metadata(borehole)
+
+        section_metadata = self._section_index(
+            borehole_metadata)[_identifier_key(section)].get(section)
+
+        if not section_metadata:
+            raise KeyError(f'Section {section} could not be found.')
+
+        return borehole_metadata['publicid'], section_metadata
+
     def _get_borehole_id(self, borehole_name: str) -> str:
         """
         Get the borehole ID by its name.
         """
         # check whether it is a valid UUID
-        try:
-            uuid.UUID(borehole_name)
+        if _identifier_key(borehole_name) == 'publicid':
             return borehole_name
-        except ValueError:
-            pass
 
         # if not, get the borehole ID by its name
-        borehole = next(
-            (bh for bh in self.metadata if bh['name'] == borehole_name), None)
-
-        if not borehole:
-            raise KeyError(f'Borehole {borehole_name} could not be found.')
-
-        return borehole['publicid']
+        return self.get_borehole_metadata(borehole_name)['publicid']
 
     def _get_section_id(self, borehole_id: str, section_name: str) -> str:
         """
         Get the section ID by its name.
         """
         # check whether it is a valid UUID
-        try:
-            uuid.UUID(section_name)
+        if _identifier_key(section_name) == 'publicid':
             return section_name
-        except ValueError:
-            pass
 
         # if not, get the section ID by its name
-        borehole_metadata = self.get_borehole_metadata(borehole_id)
-        section = next(
-            (section for section in borehole_metadata['sections']
-             if section['name'] == section_name), None)
+        return self.get_section_metadata(
+            borehole_id, section_name)['publicid']
 
-        if not section:
-            raise KeyError(f'Section {section_name} could not be found.')
+    def _cache_kwargs(self, endtime: datetime) -> dict:
+        """
+        Returns the request arguments to cache the response of a time window
+        ending at endtime, if it is old enough to be cached.
+        """
+        if self._cache is None or \
+                not _is_historical(endtime, self._cache_delay):
+            return {}
+        return {'expire_after': requests_cache.NEVER_EXPIRE}
 
-        return section['publicid']
+    def _make_api_request_bytes(self, request_url: str,
+                                params: dict | None = None,
+                                **kwargs) -> bytes | None:
+        """
+        Requests the given URL and returns the undecoded response body, or
+        None if no data was received.
 
-    def _make_api_request(self, request_url: str, params: dict = {}):
+        :raises RequestsError: If the request failed.
+        """
         try:
             response = make_request(
-                requests.get,
+                self._session.get,
                 request_url,
                 params,
                 self._timeout,
                 nocontent_codes=(
                     204,
-                    404))
+                    404),
+                **kwargs)
 
         except NoContent:
             self.logger.warning('No data received.')
-            return {}
         except RequestsError as err:
-            self.logger.error(f"Request Error while fetching data ({err}).")
-        except BaseException as err:
-            self.logger.error(f"Error while fetching data {err}")
+            self.logger.error("Request Error while fetching data (%s).", err)
+            raise
         else:
             self.logger.info('HYDWS data received.')
-            return json.loads(response)
+            return response
+
+    def _make_api_request(self, request_url: str,
+                          params: dict | None = None, **kwargs):
+        response = self._make_api_request_bytes(request_url, params, **kwargs)
+
+        if response is None:
+            return {}
+
+        return json_loads(response)
@@ -0,0 +1,194 @@
+import importlib.util
+import os
+import uuid
+from copy import deepcopy
+from datetime import datetime
+
+import pytest
+import responses
+
+from hydws import RequestsError, json_loads
+from hydws.client import HYDWSDataSource
+
+DIRPATH = os.path.dirname(os.path.abspath(__file__))
+HYDJSON = os.path.join(DIRPATH, '..', '..', 'parser', 'tests',
+                       'hydraulics.json')
+URL = 'http://hydws.test/hydws/v1'
+STARTTIME = datetime(2020, 11, 24, 13)
+ENDTIME = datetime(2020, 11, 24, 14)
+
+
+@pytest.fixture
+def hydjson():
+    with open(HYDJSON, 'rb') as f:
+        hydjson = json_loads(f.read())
+    return hydjson
+
+
+@pytest.fixture
+def boreholes(hydjson):
+    borehole = deepcopy(hydjson)
+    for section in borehole['sections']:
+        section.pop('hydraulics')
+    return [borehole]
+
+
+@pytest.fixture
+def client(boreholes):
+    with responses.RequestsMock() as rsps:
+        rsps.get(f'{URL}/boreholes', json=boreholes)
+        with HYDWSDataSource(URL) as hydws:
+            yield hydws, rsps
+
+
+class TestHYDWSDataSource:
+    def test_init(self, client, boreholes):
+        hydws, _ = client
+        assert hydws.list_boreholes() == boreholes
+        assert hydws.list_borehole_names() == ['ST1']
+        assert hydws.list_borehole_names('both') == \
+            [('ST1', boreholes[0]['publicid'])]
+        assert hydws.list_section_names('ST1') == \
+            [section['name'] for section in boreholes[0]['sections']]
+
+    def test_compression(self, client):
+        _, rsps = client
+        encodings = rsps.calls[0].request.headers['Accept-Encoding']
+        # br is negotiated once brotli from the speedups extra is installed
+        brotli = any(importlib.util.find_spec(name)
+                     for name in ('brotli', 'brotlicffi'))
+        assert ('br' in encodings.split(', ')) == brotli
+        assert 'gzip' in encodings.split(', ')
+
+    def test_metadata_lookup(self, client, hydjson):
+        hydws, _ = client
+        section = hydjson['sections'][1]
+
+        assert hydws.get_borehole_metadata('ST1') is \
+            hydws.get_borehole_metadata(hydjson['publicid'])
+        assert hydws.get_section_metadata('ST1', section['name']) is \
+            hydws.get_section_metadata('ST1', section['publicid'])
+        assert hydws._get_section_id('ST1', section['name']) == \
+            section['publicid']
+
+        with pytest.raises(KeyError):
+            hydws.get_borehole_metadata('ST2')
+        with pytest.raises(KeyError):
+            hydws.get_section_metadata('ST1', 'ST1_section_99')
+
+    def test_uuid_forms(self, client, hydjson):
+        hydws, _ = client
+        publicid = uuid.UUID(hydjson['sections'][1]['publicid'])
+
+        for form in (publicid.hex, f'{{{publicid}}}', publicid.urn):
+            assert hydws._get_borehole_id(form) == form
+            assert hydws._get_section_id('ST1', form) == form
+
+    def test_metadata_ttl(self, boreholes):
+        with responses.RequestsMock() as rsps:
+            rsps.get(f'{URL}/boreholes', json=boreholes)
+            hydws = HYDWSDataSource(URL, metadata_ttl=0)
+            hydws.list_boreholes()
+            assert len(rsps.calls) == 2
+            hydws.close()
+
+    def test_borehole_without_name(self, boreholes):
+        del boreholes[0]['name']
+
+        with responses.RequestsMock() as rsps:
+            rsps.get(f'{URL}/boreholes', json=boreholes)
+            with HYDWSDataSource(URL) as hydws:
+                assert hydws.list_borehole_names('both') == \
+                    [(None, boreholes[0]['publicid'])]
+                assert hydws.get_borehole_metadata(
+                    boreholes[0]['publicid']) == boreholes[0]
+
+    def test_metadata_refresh_sections(self, boreholes):
+        renamed = deepcopy(boreholes)
+        renamed[0]['sections'][0]['name'] = 'renamed'
+
+        with responses.RequestsMock() as rsps:
+            rsps.get(f'{URL}/boreholes', json=boreholes)
+            hydws = HYDWSDataSource(URL)
+            old = hydws.get_borehole_metadata('ST1')
+
+            rsps.replace(responses.GET, f'{URL}/boreholes', json=renamed)
+            hydws._load_metadata()
+
+            # a lookup which resolved the borehole before the refresh
+            hydws._section_index(old)
+            assert hydws.list_section_names('ST1')[0] == 'renamed'
+            assert hydws.get_section_metadata('ST1', 'renamed') == \
+                renamed[0]['sections'][0]
+            hydws.close()
+
+    def test_get_section_hydraulics(self, client, hydjson):
+        hydws, rsps = client
+        borehole = hydjson['publicid']
+        section = hydjson['sections'][1]
+        rsps.get(f'{URL}/boreholes/{borehole}/sections/'
+                 f'{section["publicid"]}/hydraulics',
+                 json=section['hydraulics'])
+
+        hydraulics = hydws.get_section_hydraulics(
+            'ST1', section['name'], STARTTIME, ENDTIME)
+        assert hydraulics == section['hydraulics']
+
+        df = hydws.get_section_hydraulics(
+            'ST1', section['name'], STARTTIME, ENDTIME,
+            format='pandas')
+        assert list(df.columns) == ['topflow', 'toppressure']
+        assert len(df) == len(section['hydraulics'])
+
+    def test_session_reused(self, client, hydjson):
+        hydws, rsps = client
+        session = hydws._session
+        hydws.get_borehole_metadata('ST1')
+        rsps.get(f'{URL}/boreholes/{hydjson["publicid"]}', json=hydjson)
+        hydws.get_borehole('ST1')
+        assert hydws._session is session
+        assert len(rsps.calls) == 2
+
+    def test_get_sections(self, client, hydjson):
+        hydws, rsps = client
+        borehole = hydjson['publicid']
+        for section in hydjson['sections']:
+            rsps.get(f'{URL}/boreholes/{borehole}/sections/'
+                     f'{section["publicid"]}/hydraulics',
+                     json=section['hydraulics'])
+
+        names = [section['name'] for section in hydjson['sections']]
+        sections = hydws.get_sections('ST1', names, STARTTIME, ENDTIME)
+
+        assert [section['name'] for section in sections] == names
+        assert [section['hydraulics'] for section in sections] == \
+            [section['hydraulics'] for section in hydjson['sections']]
+        assert 'hydraulics' not in hydws.get_section_metadata('ST1', names[1])
+
+    def test_request_error(self, client, hydjson):
+        hydws, rsps = client
+        rsps.get(f'{URL}/boreholes/{hydjson["publicid"]}', status=500)
+
+        with pytest.raises(RequestsError):
+            hydws.get_borehole('ST1')
+
+    def test_cache(self, boreholes, hydjson, tmp_path):
+        pytest.importorskip('requests_cache')
+        borehole = hydjson['publicid']
+        section = hydjson['sections'][1]
+        url = f'{URL}/boreholes/{borehole}/sections/' \
+            f'{section["publicid"]}/hydraulics'
+
+        with responses.RequestsMock() as rsps:
+            rsps.get(f'{URL}/boreholes', json=boreholes)
+            rsps.get(url, json=section['hydraulics'])
+            with HYDWSDataSource(
+                    URL, cache=str(tmp_path / 'hydws.sqlite')) as hydws:
+                for _ in range(2):
+                    hydws.get_section_hydraulics(
+                        'ST1', section['name'], STARTTIME, ENDTIME)
+                    hydws.get_section_hydraulics(
+                        'ST1', section['name'], STARTTIME, datetime.now())
+                    hydws.list_boreholes()
+
+            assert len(rsps.calls) == 4
@@ -1,31 +1,99 @@
 import logging
 import uuid
+import warnings
 from collections.abc import MutableMapping
-from copy import deepcopy
 from datetime import datetime
+from functools import lru_cache
 
 import pandas as pd
 from typing_extensions import Self
 
+from hydws import json_loads
 from hydws.parser.schema import (BoreholeSchema, SectionSchema,
                                  list_hydraulics_fields)
 
+_HYDRAULIC_FIELDS = frozenset(list_hydraulics_fields())
+
 
 def is_valid_uuid(val) -> bool:
+    return _is_valid_uuid(str(val))
+
+
+@lru_cache(maxsize=1024)
+def _is_valid_uuid(val: str) -> bool:
     try:
-        uuid.UUID(str(val))
+        uuid.UUID(val)
         return True
     except ValueError:
         return False
 
 
 def as_uuid(val: str | uuid.UUID) -> uuid.UUID:
-    if isinstance(val, uuid.UUID):
-        return val
-    elif isinstance(val, str) and is_valid_uuid(val):
-        return uuid.UUID(val)
-    else:
-        return uuid.UUID(val)
+    return val if isinstance(val, uuid.UUID) else uuid.UUID(str(val))
+
+
+def _copy_metadata(metadata: dict) -> dict:
+    """Copies section or borehole metadata.
+
+    Metadata values are immutable scalars (str, numbers, bool, UUID) or
+    flat ``{'value': x, ...}`` dicts, so copying one level deep is
+    enough and much cheaper than ``copy.deepcopy``.
+    """
+    if not metadata:
+        return {}
+    return {k: v.copy() if type(v) is dict else v
+            for k, v in metadata.items()}
+
+
+def _format_datetimes(index: pd.DatetimeIndex) -> list[str]:
+    """Formats a DatetimeIndex as ISO 8601 strings with second precision.
+
+    Uses NumPy's datetime64 string conversion, which is equivalent to
+    ``index.strftime('%Y-%m-%dT%H:%M:%S')`` without calling strftime
+    for every element.
+    """
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.values.astype('datetime64[s]').astype(str).tolist()
+
+
+def _parse_datetimes(values: list[str],
+                     mixed_utc: bool = True) -> pd.DatetimeIndex | None:
+    """Parses ISO 8601 strings into a DatetimeIndex named 'datetime'.
+
+    Strings with different utc offsets, e.g. across a dst change, can't
+    share one fixed offset. They are converted to utc if mixed_utc is
+    set, otherwise None is returned.
+    """
+    try:
+        with warnings.catch_warnings():
+            # pandas < 3 warns and returns an object index for mixed offsets
+            warnings.simplefilter('ignore', FutureWarning)
+            index = pd.to_datetime(values, format='ISO8601')
+    except ValueError:
+        index = None
+    if not isinstance(index, pd.DatetimeIndex):
+        if not mixed_utc:
+            return None
+        index = pd.to_datetime(values, format='ISO8601', utc=True)
+    return index.rename('datetime')
+
+
+def _unwrap_samples(data: list[dict]) -> dict[str, list]:
+    """Unwraps hydws-json hydraulic samples into one list per field.
+
+    Samples are flat ``{field: {'value': v}}`` dicts. Fields missing from
+    a sample are left as None in their list.
+    """
+    columns = {}
+    for i, sample in enumerate(data):
+        for field, value in sample.items():
+            column = columns.get(field)
+            if column is None:
+                column = columns[field] = [None] * len(data)
+            column[i] = value.get('value') \
+                if isinstance(value, dict) else value
+    return columns
 
 
 def create_value(value) -> dict:
@@ -58,39 +126,97 @@ def empty_borehole_metadata() -> dict:
 
 
 class SectionHydraulics:
+    __slots__ = ('metadata', '_hydraulics', '_datetime_cache')
+
     def __init__(self, hydjson: dict | None = None) -> None:
         """Creates a SectionHydraulics object.
 
         Args:
             hydjson: A dictionary containing the hydws-json of a section.
         """
-        self.metadata = empty_section_metadata()
         self._hydraulics = None
+        self._datetime_cache = None
 
+        # only build placeholder metadata if no json replaces it anyway
         if hydjson:
             self._from_json(hydjson)
+        else:
+            self.metadata = empty_section_metadata()
 
-    def _from_json(self, data: dict) -> None:
+    def _from_json(self, data: dict,
+                   hydraulics: pd.DataFrame | None = None) -> None:
         """Loads hydws-json into the object.
 
         Args:
             data: A dictionary containing the hydws-json of a section.
+            hydraulics: The already loaded hydraulics of the section, if
+                they were parsed in a batch.
         """
         if 'hydraulics' not in data:
             data['hydraulics'] = []
 
-        self.load_hydraulic_json(data['hydraulics'])
+        if hydraulics is None:
+            self.load_hydraulic_json(data['hydraulics'])
+        else:
+            self.hydraulics = hydraulics
 
         self.metadata = {k: v for k, v in data.items() if k != 'hydraulics'}
 
         SectionSchema.model_validate(self.metadata)
 
     @classmethod
-    def _load_hydraulic_json(cls, data: list[dict]) -> pd.DataFrame:
+    def batch_from_json(cls, data: list[dict]) -> list[Self]:
+        """Creates SectionHydraulics objects from a list of section json.
+
+        The datetimes of all sections are parsed in one call, which avoids
+        paying the fixed parsing overhead once per section.
+
+        Args:
+            data: A list of dictionaries containing the hydws-json of
+                sections.
+
+        Returns:
+            A list of SectionHydraulics objects, in the order of data.
+        """
+        unwrapped = [_unwrap_samples(section.get('hydraulics') or [])
+                     for section in data]
+
+        # sections may use different utc offsets, e.g. across a dst
+        # change, which one index can't hold; parse those per section
+        index = _parse_datetimes(
+            [v for columns in unwrapped for v in columns.get('datetime', [])],
+            mixed_utc=False)
+        if index is None:
+            unwrapped = [None] * len(data)
+
+        sections = []
+        start = 0
+        for section_json, columns in zip(data, unwrapped):
+            if columns is None:
+                hydraulics = None
+            elif not columns:
+                hydraulics = pd.DataFrame()
+            else:
+                end = start + len(columns.pop('datetime'))
+                hydraulics = pd.DataFrame(columns, index=index[start:end])
+                start = end
+
+            # _from_json sets all attributes, skip the placeholder metadata
+            section = cls.__new__(cls)
+            section._from_json(section_json, hydraulics)
+            sections.append(section)
+
+        return sections
+
+    @classmethod
+    def _load_hydraulic_json(cls, data: list[dict],
+                             dtype: str | None = None) -> pd.DataFrame:
         """Loads hydws-json of hydraulics into a DataFrame.
 
         Args:
             data: A list of dictionaries containing the hydws-json.
+            dtype: Optional float dtype for the numeric columns, e.g.
+                'float32' to halve their memory footprint.
 
         Returns:
             A DataFrame containing the hydraulic data.
@@ -98,23 +224,42 @@ class SectionHydraulics:
         if data is None or len(data) == 0:
             return pd.DataFrame()
 
-        dataframe = pd.json_normalize(data, sep='_')
+        columns = _unwrap_samples(data)
+
+        index = _parse_datetimes(columns.pop('datetime'))
+
+        df = pd.DataFrame(columns, index=index)
 
-        dataframe.columns = dataframe.columns.str.replace(
-            "(_).*", "", regex=True)
+        if dtype is not None:
+            df = df.astype(
+                {col: dtype for col in df.select_dtypes('float').columns})
 
-        dataframe['datetime'] = pd.to_datetime(dataframe['datetime'])
-        dataframe.set_index(['datetime'], inplace=True, drop=True)
+        return df
 
-        return dataframe
+    @classmethod
+    def _load_hydraulic_bytes(cls, data: bytes,
+                              dtype: str | None = None) -> pd.DataFrame:
+        """Loads raw hydws-json bytes of hydraulics into a DataFrame.
+
+        Args:
+            data: The encoded hydws-json list of hydraulic samples, e.g.
+                the body of a web service response.
+            dtype: Optional float dtype for the numeric columns.
 
-    def load_hydraulic_json(self, data: list[dict]) -> None:
+        Returns:
+            A DataFrame containing the hydraulic data.
+        """
+        return cls._load_hydraulic_json(json_loads(data), dtype)
+
+    def load_hydraulic_json(self, data: list[dict],
+                            dtype: str | None = None) -> None:
         """Loads hydws-json of hydraulics into the object.
 
         Args:
             data: A list of dictionaries containing the hydws-json.
+            dtype: Optional float dtype for the numeric columns.
         """
-        self.hydraulics = self._load_hydraulic_json(data)
+        self.hydraulics = self._load_hydraulic_json(data, dtype)
 
     def query_datetime(self,
                        starttime: datetime | None = None,
@@ -130,11 +275,21 @@ class SectionHydraulics:
             A new SectionHydraulics object with filtered data.
         """
         obj = SectionHydraulics()
-        obj.metadata = deepcopy(self.metadata)
-        obj.hydraulics = self.hydraulics.loc[
-            (self.hydraulics.index >= starttime if starttime else True)
-            & (self.hydraulics.index <= endtime if endtime else True)
-        ]
+        obj.metadata = _copy_metadata(self.metadata)
+
+        # the index is kept sorted, so the range is one contiguous slice
+        # which already is valid and sorted and can bypass the setter;
+        # it is copied so the result doesn't share data with this section
+        index = self.hydraulics.index
+        if len(index) == 0:
+            obj._hydraulics = self.hydraulics.copy()
+            return obj
+
+        start = index.searchsorted(starttime, side='left') \
+            if starttime else 0
+        end = index.searchsorted(endtime, side='right') \
+            if endtime else len(index)
+        obj._hydraulics = self.hydraulics.iloc[start:end].copy()
 
         return obj
 
@@ -145,8 +300,10 @@ class SectionHydraulics:
     @hydraulics.setter
     def hydraulics(self, data: pd.DataFrame) -> None:
         self._validate_dataframe(data)
-        data.sort_index(inplace=True)
+        if not data.index.is_monotonic_increasing:
+            data.sort_index(inplace=True)
         self._hydraulics = data
+        self._datetime_cache = None
 
     def to_json(self, resample: int | None = None) -> dict:
         """Returns hydraulic data of a section as a dict object.
@@ -158,38 +315,63 @@ class SectionHydraulics:
             A dictionary containing section metadata and hydraulic samples.
         """
         # create hydraulic samples from dataframe
-        if len(self.hydraulics) == 0:
+        if self.hydraulics is None or len(self.hydraulics) == 0:
             samples = []
         else:
             if resample is not None:
                 hydraulics = self.hydraulics.resample(
                     f'{resample}S').mean().interpolate('time')
             else:
-                # copy when not resampling
-                hydraulics = self.hydraulics.copy()
-
-            hydraulics['datetime'] = hydraulics.index
-            hydraulics['datetime'] = \
-                hydraulics['datetime'].dt.strftime(
-                    '%Y-%m-%dT%H:%M:%S')
-
-            samples = [{k: {'value': v} for k, v in m.items()
-                        if v == v and v is not None}
-                       for m in hydraulics.to_dict('records')]
+                hydraulics = self.hydraulics
+
+            # fill the samples column by column, missing values are found
+            # with one vectorised notna per column instead of per cell;
+            # columns are taken by position so repeated names are merged
+            samples = [{} for _ in range(len(hydraulics))]
+            for i, field in enumerate(hydraulics.columns):
+                column = hydraulics.iloc[:, i]
+                valid = column.notna().to_numpy()
+                if valid.all():
+                    for sample, v in zip(samples, column.tolist()):
+                        sample[field] = {'value': v}
+                else:
+                    for sample, v, ok in zip(samples, column.tolist(),
+                                             valid.tolist()):
+                        if ok:
+                            sample[field] = {'value': v}
+
+            # datetimes come from the index, the frame is never modified
+            if resample is not None:
+                datetimes = _format_datetimes(hydraulics.index)
+            else:
+                datetimes = self._format_index()
+            for sample, v in zip(samples, datetimes):
+                sample['datetime'] = {'value': v}
 
-        hydjson = deepcopy(self.metadata)
+        hydjson = _copy_metadata(self.metadata)
         hydjson['publicid'] = str(hydjson['publicid'])
         hydjson['hydraulics'] = samples
         return hydjson
 
+    def _format_index(self) -> list[str]:
+        """Returns the formatted datetimes of the hydraulics index.
+
+        The strings are cached for as long as the frame keeps the same
+        index object. pandas indexes are immutable, so any change to the
+        index replaces the object and invalidates the cache.
+        """
+        index = self._hydraulics.index
+        if self._datetime_cache is None \
+                or self._datetime_cache[0] is not index:
+            self._datetime_cache = (index, _format_datetimes(index))
+        return self._datetime_cache[1]
+
     def _validate_dataframe(self, dataframe: pd.DataFrame) -> None:
-        hydraulic_fields = list_hydraulics_fields()
-        if not all(col in hydraulic_fields for col in dataframe.columns):
+        invalid = set(dataframe.columns).difference(_HYDRAULIC_FIELDS)
+        if invalid:
             raise KeyError(
-                f'Columns '
-                f'{list(set(dataframe.columns) - set(hydraulic_fields))}'
-                f' in hydraulic dataframe are not valid names. Must be one'
-                f' of {hydraulic_fields}.')
+                f'Columns {list(invalid)} in hydraulic dataframe are not'
+                f' valid names. Must be one of {list_hydraulics_fields()}.')
 
 
 class BoreholeHydraulics(MutableMapping):
@@ -197,6 +379,8 @@ class BoreholeHydraulics(MutableMapping):
     Parses hydraulic data of a borehole between "dataframes" and "hydws-json".
     """
 
+    __slots__ = ('logger', '__sections', 'metadata', 'nloc')
+
     def __init__(self, hydjson: dict | None = None) -> None:
 
         self.logger = logging.getLogger(__name__)
@@ -223,7 +407,7 @@ class BoreholeHydraulics(MutableMapping):
             A new BoreholeHydraulics object with filtered data.
         """
         obj = BoreholeHydraulics()
-        obj.metadata = deepcopy(self.metadata)
+        obj.metadata = _copy_metadata(self.metadata)
 
         for key, section in self.__sections.items():
             obj[key] = section.query_datetime(starttime, endtime)
@@ -235,8 +419,7 @@ class BoreholeHydraulics(MutableMapping):
 
         self.metadata = {k: v for k, v in data.items() if k != 'sections'}
         BoreholeSchema.model_validate(self.metadata)
-        for section_json in sections:
-            section = SectionHydraulics(section_json)
+        for section in SectionHydraulics.batch_from_json(sections):
             self[section.metadata['publicid']] = section
 
     def add_empty_section(self) -> uuid.UUID:
@@ -282,15 +465,21 @@ class BoreholeHydraulics(MutableMapping):
 
     def __setitem__(self, key, value):
         if isinstance(value, SectionHydraulics):
-            self.__sections[as_uuid(key)] = value
+            key = as_uuid(key)
+            if key in self.__sections:
+                self._drop_name(self.__sections[key])
+            self.__sections[key] = value
             if 'name' in value.metadata:
-                self.nloc[value.metadata['name']
-                          ] = self.__sections[as_uuid(key)]
+                self.nloc[value.metadata['name']] = value
 
     def __delitem__(self, key):
-        if 'name' in self.__sections[as_uuid(key)].metadata:
-            del self.nloc[self.__sections[as_uuid(key)].metadata['name']]
-        del self.__sections[as_uuid(key)]
+        self._drop_name(self.__sections.pop(as_uuid(key)))
+
+    def _drop_name(self, section: SectionHydraulics) -> None:
+        name = section.metadata.get('name')
+        # only drop the name if it was not taken over by another section
+        if name is not None and self.nloc.get(name) is section:
+            del self.nloc[name]
 
     def __iter__(self):
         return iter(self.__sections)
@@ -299,7 +488,10 @@ class BoreholeHydraulics(MutableMapping):
         return len(self.__sections)
 
     def __contains__(self, key):
-        return key in self.__sections
+        try:
+            return as_uuid(key) in self.__sections
+        except ValueError:
+            return False
 
     def __repr__(self):
         return f'<HYDWSParser: {repr(self.__sections)}>'
@@ -314,7 +506,7 @@ class BoreholeHydraulics(MutableMapping):
             A dictionary containing borehole metadata and all sections with
             their hydraulic samples.
         """
-        hydjson = deepcopy(self.metadata)
+        hydjson = _copy_metadata(self.metadata)
         hydjson['publicid'] = str(hydjson['publicid'])
         hydjson['sections'] = [section.to_json(resample=resample)
                                for section in self.__sections.values()]
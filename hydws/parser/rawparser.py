@@ -1,13 +1,37 @@
-import json
 import logging
-from copy import deepcopy
 
 import numpy as np
 import pandas as pd
+from hydws import json_loads
 from hydws.coordinates import CoordinateTransformer
 from hydws.parser import BoreholeHydraulics
 
 
+def _interpolate_trajectory(d: np.ndarray, depth: np.ndarray,
+                            x: np.ndarray, y: np.ndarray,
+                            z: np.ndarray) -> tuple:
+    """
+    Interpolate coordinates at all depths d between the bracketing
+    trajectory points, given the trajectory as arrays of depth, x, y and z.
+    Depths outside of the trajectory are extrapolated from its ends.
+    """
+    d = np.asarray(d, dtype=float)
+
+    order = np.argsort(depth, kind='stable')
+    depth, x, y, z = depth[order], x[order], y[order], z[order]
+
+    # locate the bracketing points of every depth at once
+    i1 = np.clip(np.searchsorted(depth, d), 1, len(depth) - 1)
+    i0 = i1 - 1
+    w = (d - depth[i0]) / (depth[i1] - depth[i0])
+
+    # exact depths return the trajectory point itself
+    exact = depth[i1] == d
+
+    return tuple(np.where(exact, c[i1], c[i0] + w * (c[i1] - c[i0]))
+                 for c in (x, y, z))
+
+
 def calculate_coords(d: float, trajectory: pd.DataFrame, cols: list) -> tuple:
     """
     Calculate coordinates at depth d along trajectory.
@@ -17,94 +41,111 @@ def calculate_coords(d: float, trajectory: pd.DataFrame, cols: list) -> tuple:
     :param cols: names of columns in which the trajectory is saved, expects
                  [depth, northing, easting, elevation]
     """
-    # check if exact depth can be found
-    row = trajectory.loc[trajectory[cols[0]] == d]
-    if not row.empty:
-        x, y, z = row.iloc[0][cols[1:]]
-    # if not, interpolate between two closest depths
-    else:
-        df_sort = trajectory.iloc[(
-            trajectory[cols[0]] - d).abs().argsort()[:2]]
-        d0, x0, y0, z0 = df_sort.iloc[0][cols]  # next larger
-        d1, x1, y1, z1 = df_sort.iloc[1][cols]  # next smaller
-
-        # interpolate elevation
-        z = (d - d0) / (d1 - d0) * (z1 - z0) + z0
-
-        # interpolate x and y using absolute z
-        x = np.interp(z, (z0, z1), (x0, x1))
-        y = np.interp(z, (z0, z1), (y0, y1))
-    return x, y, z
+    x, y, z = _interpolate_trajectory(
+        [d], *(trajectory[c].to_numpy(dtype=float) for c in cols))
+    return x[0], y[0], z[0]
+
+
+# condition rules of the raw parser config, each one returns the mask of
+# samples where the condition column replaces the current result
+_CONDITION_RULES = {
+    'above': lambda column, current, value: column > value,
+    'below': lambda column, current, value: column < value,
+    'above-current': lambda column, current, value: column - current > value,
+    'below-current': lambda column, current, value: current - column > value,
+}
+
+# config columns which are not wrapped into a {'value': x} dict
+_NOT_REAL_QUANTITIES = frozenset([
+    'publicid',
+    'topclosed',
+    'bottomclosed',
+    'description',
+    'name',
+    'borehole_name',
+    'location',
+    'institution'])
+
+
+def _integer_dtype(df: pd.DataFrame) -> np.dtype | None:
+    """
+    Returns the common dtype of the columns if all of them are integer,
+    None otherwise.
+    """
+    dtypes = df.dtypes.tolist()
+    if dtypes and all(isinstance(d, np.dtype) and d.kind in 'iu'
+                      for d in dtypes):
+        return np.result_type(*dtypes)
+    return None
+
+
+def _not_null(value) -> bool:
+    """
+    Scalar null check for config records, which only contain None, NaN,
+    NaT or pd.NA as missing values. Cheaper than calling pd.notnull.
+    """
+    if isinstance(value, float):
+        return value == value
+    return value is not None and value is not pd.NaT and value is not pd.NA
+
+
+def _config_record_to_metadata(record: dict) -> dict:
+    """
+    Convert a row of a borehole or section config to hydws metadata,
+    dropping missing values and adding the value subkey where necessary.
+    """
+    return {k: v if k in _NOT_REAL_QUANTITIES else {'value': v}
+            for k, v in record.items()
+            if k != 'borehole_name' and _not_null(v)}
 
 
 def hydws_metadata_from_configs(borehole_name: str,
-                                boreholes_path: str,
-                                sections_path: str,
+                                boreholes_path: str | pd.DataFrame,
+                                sections_path: str | pd.DataFrame,
                                 origin: list[float] = [0, 0, 0],
                                 local_crs: str = 'EPSG:4326') -> dict:
     """
     Create borehole metadata in json format from raw csv files.
 
     :param borehole_name:   name of borehole for which metadata is requested.
-    :param boreholes_path:  path of csv with borehole information.
+    :param boreholes_path:  path of csv with borehole information, or the
+                            already parsed csv as a dataframe.
                             Required columns: name, publicid, x, y, z
-    :param sections_path:   path of csv with sections information.
+    :param sections_path:   path of csv with sections information, or the
+                            already parsed csv as a dataframe.
                             Required columns: borehole(name), name, publicid
     :param origin:          origin of coordinates in csv files (ENU).
     :param local_crs:       CRS of coordinates or, if used, origin point.
     """
 
-    # read configs
-    boreholes_csv = pd.read_csv(boreholes_path)
-    sections_csv = pd.read_csv(sections_path)
+    # read configs, unless they were parsed once by the caller already
+    boreholes_csv = boreholes_path \
+        if isinstance(boreholes_path, pd.DataFrame) \
+        else pd.read_csv(boreholes_path)
+    sections_csv = sections_path \
+        if isinstance(sections_path, pd.DataFrame) \
+        else pd.read_csv(sections_path)
 
-    boreholes_csv = boreholes_csv.loc[
-        boreholes_csv['name'] == borehole_name]
-
-    not_real_quantities = [
-        'publicid',
-        'topclosed',
-        'bottomclosed',
-        'description',
-        'name',
-        'borehole_name',
-        'location',
-        'institution']
+    # the borehole is a single row, only convert that one
+    borehole = boreholes_csv.loc[
+        boreholes_csv['name'] == borehole_name].iloc[0].to_dict()
 
     transformer = CoordinateTransformer(local_crs, origin[0], origin[1])
 
     # transform local mouth coordinates to world coordinates
-    boreholes_csv[['longitude', 'latitude', 'altitude']] = pd.Series(
-        transformer.from_local_coords(
-            *boreholes_csv[['x', 'y', 'z']].T.values)
-    )
-    boreholes_csv.drop(['x', 'y', 'z'], axis=1, inplace=True)
-
-    # add value subkey where necessary
-    for col in boreholes_csv.columns:
-        if col not in not_real_quantities:
-            boreholes_csv[col] = boreholes_csv[col].map(
-                lambda x: {'value': x}, na_action='ignore')
+    longitude, latitude, altitude = transformer.from_local_coords(
+        borehole.pop('x'), borehole.pop('y'), borehole.pop('z'))
+    borehole['longitude'] = float(longitude)
+    borehole['latitude'] = float(latitude)
+    borehole['altitude'] = float(altitude)
 
     # convert to dict
-    borehole = [{k: v for k, v in m.items() if pd.notnull(v)}
-                for m in boreholes_csv.to_dict(orient='records')][0]
-
-    section_df = sections_csv.loc[sections_csv['borehole_name']
-                                  == borehole_name].copy()
-    if not section_df.empty:
-        # create value dict from columns
-        for col in section_df.columns:
-            if col not in not_real_quantities:
-                section_df[col] = section_df[col].map(
-                    lambda x: {'value': x}, na_action='ignore')
-
-        # convert to array of dicts
-        sections = [{k: v for k, v in m.items() if pd.notnull(v)}
-                    for m in section_df.drop(columns=['borehole_name']
-                                             ).to_dict(orient='records')]
-    else:
-        sections = []
+    borehole = _config_record_to_metadata(borehole)
+
+    # convert to array of dicts
+    sections = [_config_record_to_metadata(m) for m in sections_csv.loc[
+        sections_csv['borehole_name'] == borehole_name
+    ].to_dict(orient='records')]
 
     # append to borehole
     borehole['sections'] = sections
@@ -113,7 +154,7 @@ def hydws_metadata_from_configs(borehole_name: str,
 
 
 def calculate_section_trajectories(borehole: dict,
-                                   trajectory_path: str,
+                                   trajectory_path: str | pd.DataFrame,
                                    origin: list[float] = [0, 0, 0],
                                    local_crs: str = 'EPSG:4326',
                                    ) -> dict:
@@ -124,30 +165,42 @@ def calculate_section_trajectories(borehole: dict,
     topmeasureddepth and bottommeasureddepth information.
 
     :param borehole:        borehole metadata dictionary
-    :param trajectory_path: path to csv with trajectory information.
+    :param trajectory_path: path to csv with trajectory information, or the
+                            already loaded trajectory as a dataframe.
                             Required columns: depth, x, y, z
     :param origin:          origin of coordinates in csv files (ENU).
     :param local_crs:       CRS of coordinates or, if used, origin point.
     """
-    # get the correct trajectory
-    trajectory = pd.read_csv(trajectory_path, index_col=0)
-
-    # coordinate calculations need to be done for top and bottom
-    for field in ['top', 'bottom']:
-        for section in borehole['sections']:
-            coordinates = \
-                calculate_coords(section[f'{field}measureddepth']['value'],
-                                 trajectory,
-                                 ['depth', 'x', 'y', 'z'])
-
-            transformer = CoordinateTransformer(
-                local_crs, origin[0], origin[1])
-            coordinates = transformer.from_local_coords(
-                coordinates[0], coordinates[1], coordinates[2])
-
-            section[f'{field}longitude'] = {'value': coordinates[0]}
-            section[f'{field}latitude'] = {'value': coordinates[1]}
-            section[f'{field}altitude'] = {'value': coordinates[2]}
+    # get the correct trajectory, unless the caller loaded it already
+    trajectory = trajectory_path \
+        if isinstance(trajectory_path, pd.DataFrame) \
+        else pd.read_csv(trajectory_path, index_col=0)
+    depth, x, y, z = (trajectory[c].to_numpy(dtype=float)
+                      for c in ['depth', 'x', 'y', 'z'])
+
+    sections = borehole['sections']
+    fields = ['top', 'bottom']
+
+    if not sections:
+        return borehole
+
+    # coordinate calculations need to be done for top and bottom, do them
+    # for all sections at once and transform them in a single call
+    local = _interpolate_trajectory(
+        [section[f'{field}measureddepth']['value']
+         for field in fields for section in sections], depth, x, y, z)
+
+    transformer = CoordinateTransformer(local_crs, origin[0], origin[1])
+    coordinates = transformer.from_local_coords(*local)
+    longitude, latitude, altitude = \
+        (np.asarray(c).reshape(len(fields), -1).tolist()
+         for c in coordinates)
+
+    for i, field in enumerate(fields):
+        for j, section in enumerate(sections):
+            section[f'{field}longitude'] = {'value': longitude[i][j]}
+            section[f'{field}latitude'] = {'value': latitude[i][j]}
+            section[f'{field}altitude'] = {'value': altitude[i][j]}
 
     return borehole
 
@@ -167,11 +220,20 @@ class RawHydraulicsParser:
         """
         self.logger = logging.getLogger(__name__)
 
-        with open(config_path) as f:
-            self.config = json.load(f)
+        with open(config_path, 'rb') as f:
+            self.config = json_loads(f.read())
+
+        # resolve the static parts of every config entry once: referenced
+        # columns without duplicates, whether conditions apply and the
+        # name of the resulting field
+        self._plan = [(list(dict.fromkeys(c['columnNames'])),
+                       'conditions' in c, c['fieldName'], c)
+                      for c in self.config]
 
         self.sections_map = {}
         self.name_map = {}
+        self.section_info = {}
+        self._surface_offsets = {}
         self.assign_to = {'plan': self._assign_to_plan,
                           'sectionID': self._assign_to_section}
 
@@ -180,6 +242,7 @@ class RawHydraulicsParser:
                 for s in borehole['sections']:
                     self.name_map[s['name']] = s['publicid']
                     self.sections_map[s['name']] = borehole
+                    self.section_info[s['name']] = s
 
     def parse(self, data: pd.DataFrame, format='json') -> list | dict:
         """
@@ -191,18 +254,22 @@ class RawHydraulicsParser:
                 hydwsparser returns a dictionary of HYDWSParser objects.
         """
         boreholes = {}
+        # hydraulic data per section, added after all columns are parsed
+        pending = {}
+        columns = frozenset(data.columns)
 
-        for col_config in self.config:
+        for column_names, conditional, field_name, col_config in self._plan:
             # select all columns which are referenced in config
-            selection = data[data.columns.intersection(
-                col_config['columnNames'])]
+            present = [c for c in column_names if c in columns]
 
             # continue if columns not in dataframe
-            if selection.empty:
+            if not present or len(data) == 0:
                 continue
 
+            selection = data[present]
+
             # depending on conditions specified or not sum or apply cond
-            if 'conditions' in col_config:
+            if conditional:
                 selection = self._apply_conditions(col_config, selection)
             else:
                 selection = selection.sum(axis=1)
@@ -211,11 +278,23 @@ class RawHydraulicsParser:
             if not selection.any():
                 continue
 
-            selection = pd.DataFrame(selection.rename(col_config['fieldName']))
+            selection = selection.to_frame(field_name)
 
             # use correct strategy to assign column to sections
             self.assign_to[col_config['assignTo']](
-                boreholes, col_config, selection)
+                boreholes, pending, col_config, selection)
+
+        # add the collected columns to each section in a single concat,
+        # a field assigned more than once, e.g. by a plan which lists an
+        # interval repeatedly, is merged into one column first
+        for section, frames in pending.items():
+            fields = {}
+            for frame in frames:
+                name = frame.columns[0]
+                fields[name] = fields[name].combine_first(frame) \
+                    if name in fields else frame
+            section.hydraulics = pd.concat(
+                [section.hydraulics, *fields.values()], axis=1)
 
         if format == 'json':
             return [b.to_json() for b in boreholes.values()]
@@ -226,58 +305,61 @@ class RawHydraulicsParser:
 
     def _apply_conditions(self, col_config, df):
 
-        results_column = df[df.columns.intersection(
-            [col_config['columnNames'][0]])].sum(axis=1)
-        results_column.values[:] = 0
+        # missing values count as zero, as they do in a pandas sum
+        values = np.nan_to_num(df.to_numpy(dtype=np.float64), nan=0.0)
+        positions = {name: i for i, name in enumerate(df.columns)}
 
-        for condition in col_config['conditions']:
+        results = np.zeros(len(df))
+        # values are compared as floats, integer input stays integer
+        dtype = _integer_dtype(df)
+        if dtype is None:
+            dtype = np.float64
 
-            condition_column = df[df.columns.intersection(
-                condition['columnNames'])].sum(axis=1)
+        if len(df) == 0:
+            return pd.Series(results, index=df.index, dtype=dtype)
 
-            if condition_column.empty:
-                continue
+        for condition in col_config['conditions']:
 
-            if condition['rule'] == 'above':
-                logic = condition_column > condition['value']
-            elif condition['rule'] == 'below':
-                logic = condition_column < condition['value']
-            elif condition['rule'] == 'above-current':
-                logic = (condition_column
-                         - results_column) > condition['value']
-            elif condition['rule'] == 'below-current':
-                logic = (results_column
-                         - condition_column) > condition['value']
-            else:
+            condition_column = values[:, [
+                positions[name] for name in
+                dict.fromkeys(condition['columnNames'])
+                if name in positions]].sum(axis=1)
+
+            rule = _CONDITION_RULES.get(condition['rule'])
+            if rule is None:
                 self.logger.error('Condition rule unknown.')
                 raise ValueError
 
-            results_column.mask(
-                logic, condition_column, inplace=True)
+            logic = rule(condition_column, results, condition['value'])
+            np.copyto(results, condition_column, where=logic)
 
-        return results_column
+        return pd.Series(results.astype(dtype, copy=False), index=df.index)
 
-    def _assign_to_plan(
-            self, boreholes: dict, col_config: dict, column: pd.DataFrame):
+    def _assign_to_plan(self, boreholes: dict, pending: dict,
+                        col_config: dict, column: pd.DataFrame):
         with open(col_config['section'], 'r') as f:
             plan = pd.read_csv(f, sep=',', skipinitialspace=True)
 
-        config = deepcopy(col_config)
+        for field in ['date_from', 'date_until']:
+            plan[field] = pd.to_datetime(
+                plan[field], format='%Y/%m/%dT%H:%M:%S', cache=True)
 
-        plan[['date_from', 'date_until']] = \
-            plan[['date_from', 'date_until']].apply(
-            pd.to_datetime, format='%Y/%m/%dT%H:%M:%S')
+        column = column.sort_index()
 
-        for row in plan.iterrows():
-            period = column.sort_index()[
-                row[1]['date_from']:row[1]['date_until']]
-            if not period.empty:
-                config['section'] = row[1]['interval']
+        # resolve the samples of all plan rows with two binary searches,
+        # rows may overlap, so every row is kept as its own slice
+        starts = column.index.searchsorted(plan['date_from'], side='left')
+        ends = column.index.searchsorted(plan['date_until'], side='right')
+
+        for interval, start, end in zip(plan['interval'], starts, ends):
+            if end > start:
+                # _assign_to_section only reads the config, share the rest
                 self._assign_to_section(
-                    boreholes, config, period)
+                    boreholes, pending, {**col_config, 'section': interval},
+                    column.iloc[start:end])
 
-    def _assign_to_section(
-            self, boreholes: dict, col_config: dict, column: pd.DataFrame):
+    def _assign_to_section(self, boreholes: dict, pending: dict,
+                           col_config: dict, column: pd.DataFrame):
 
         borehole_data = self.sections_map[col_config['section']]
 
@@ -296,14 +378,10 @@ class RawHydraulicsParser:
             boreholes[borehole_data['publicid']
                       ] = BoreholeHydraulics(borehole_data)
 
-        # add hydraulic data to parser
-        boreholes[borehole_data['publicid']
-                  ][self.name_map[col_config['section']]].hydraulics = \
-            pd.concat([
-                boreholes[borehole_data['publicid']
-                          ][self.name_map[col_config['section']]
-                            ].hydraulics, column],
-                      axis=1)
+        # collect hydraulic data, it is added to the parser after parsing
+        section = boreholes[borehole_data['publicid']
+                            ][self.name_map[col_config['section']]]
+        pending.setdefault(section, []).append(column)
 
     def _convert_unit(self, column: pd.DataFrame, operation: str, num: float):
         return getattr(column, operation)(num)
@@ -319,15 +397,18 @@ class RawHydraulicsParser:
         :param section_id: section for which pressure was measured at surface
         :param unit_factor: factor of the desired unit (eg 10^6 for MPa)
         """
-        # get correct section info
-        sec_info = next(
-            (item for item in borehole_data['sections']
-                if item['name'] == section_id), {})
+        # the offset only depends on static metadata, compute it once
+        hydraulic_pressure = self._surface_offsets.get(section_id)
+
+        if hydraulic_pressure is None:
+            # get correct section info
+            sec_info = self.section_info.get(section_id, {})
 
-        abs_depth = borehole_data['altitude']['value'] - \
-            (sec_info['bottomaltitude']['value'])
+            abs_depth = borehole_data['altitude']['value'] - \
+                (sec_info['bottomaltitude']['value'])
 
-        # calculate hydraulic pressure
-        hydraulic_pressure = 998.2 * abs_depth * 9.81
+            # calculate hydraulic pressure
+            hydraulic_pressure = self._surface_offsets[section_id] = \
+                998.2 * abs_depth * 9.81
 
         return column + hydraulic_pressure
@@ -1,5 +1,6 @@
 import uuid
 from datetime import datetime
+from functools import lru_cache
 
 from pydantic import BaseModel
 
@@ -71,10 +72,16 @@ class BoreholeSchema(BaseModel):
     sections: list[SectionSchema] = []
 
 
-def list_hydraulics_fields():
+@lru_cache(maxsize=1)
+def _hydraulics_fields() -> tuple[str, ...]:
     real_fields = list(RealValue.model_fields.keys())
     sample_fields = list(HydraulicSampleSchema.model_fields.keys())
     hydraulic_fields = [
         f'{sf}_{n}' for n in real_fields for sf in sample_fields]
     hydraulic_fields.extend(sample_fields)
-    return hydraulic_fields
+    return tuple(hydraulic_fields)
+
+
+def list_hydraulics_fields():
+    # the schema is static, only copy the cached names for the caller
+    return list(_hydraulics_fields())
@@ -1,26 +1,40 @@
 import json
 import os
+import pickle
+import uuid
 from copy import deepcopy
 
 import pandas as pd
 import pytest
 
+from hydws import json_loads
 from hydws.parser.parser import (BoreholeHydraulics, SectionHydraulics,
-                                 empty_section_metadata, is_valid_uuid)
+                                 _format_datetimes, empty_section_metadata,
+                                 is_valid_uuid)
 
 DIRPATH = os.path.dirname(os.path.abspath(__file__))
 
 
+@pytest.fixture(scope='session')
+def _df():
+    return pd.read_parquet(os.path.join(DIRPATH, 'hydraulics.parquet'),
+                           memory_map=True)
+
+
+@pytest.fixture(scope='session')
+def _hydjson():
+    with open(os.path.join(DIRPATH, 'hydraulics.json'), 'rb') as f:
+        return f.read()
+
+
 @pytest.fixture
-def df():
-    return pd.read_parquet(os.path.join(DIRPATH, 'hydraulics.parquet'))
+def df(_df):
+    return _df.copy()
 
 
 @pytest.fixture
-def hydjson():
-    with open(os.path.join(DIRPATH, 'hydraulics.json'), 'rb') as f:
-        hydjson = json.load(f)
-    return hydjson
+def hydjson(_hydjson):
+    return json_loads(_hydjson)
 
 
 @pytest.fixture
@@ -30,6 +44,14 @@ def metadata(hydjson):
     return metadata
 
 
+@pytest.mark.parametrize('index', [
+    pd.date_range('2021-01-01 00:00:00.7', periods=3, freq='1500ms'),
+    pd.date_range('2021-01-01', periods=3, freq='h', tz='Europe/Zurich')])
+def test_format_datetimes(index):
+    assert _format_datetimes(index) == \
+        index.strftime('%Y-%m-%dT%H:%M:%S').tolist()
+
+
 class TestBoreholeHydraulics:
     def test_init(self, hydjson, df):
 
@@ -54,6 +76,64 @@ class TestBoreholeHydraulics:
         borehole_json = parser.to_json()
         assert borehole_json == hydjson
 
+    def test_contains(self, hydjson):
+        parser = BoreholeHydraulics(hydjson)
+        publicid = hydjson['sections'][0]['publicid']
+
+        assert publicid in parser
+        assert uuid.UUID(publicid) in parser
+        assert str(uuid.uuid4()) not in parser
+        assert 'not-a-uuid' not in parser
+
+    def test_delete_section(self, hydjson):
+        parser = BoreholeHydraulics(hydjson)
+        section_json = hydjson['sections'][0]
+
+        del parser[section_json['publicid']]
+
+        assert section_json['publicid'] not in parser
+        assert section_json['name'] not in parser.nloc
+        assert len(parser) == len(hydjson['sections']) - 1
+
+    def test_delete_section_shared_name(self):
+        parser = BoreholeHydraulics()
+        first = parser.add_empty_section()
+        second = parser.add_empty_section()
+
+        del parser[first]
+
+        assert parser.nloc['Unnamed Section'] is parser[second]
+
+    def test_replace_section(self):
+        parser = BoreholeHydraulics()
+        publicid = parser.add_empty_section()
+        section = SectionHydraulics()
+        section.metadata['name'] = 'Replacement'
+
+        parser[publicid] = section
+
+        assert parser.nloc == {'Replacement': section}
+
+    def test_pickle(self, hydjson):
+        parser = BoreholeHydraulics(hydjson)
+        unpickled = pickle.loads(pickle.dumps(parser))
+
+        assert unpickled.to_json() == parser.to_json()
+        for section in unpickled.nloc.values():
+            assert unpickled[section.metadata['publicid']] is section
+
+    def test_to_json_copies_metadata(self, hydjson):
+        parser = BoreholeHydraulics(hydjson)
+        borehole_json = parser.to_json()
+
+        borehole_json['longitude']['value'] = -1
+        borehole_json['sections'][0]['toplongitude']['value'] = -1
+
+        assert parser.metadata['longitude'] == hydjson['longitude']
+        section_id = hydjson['sections'][0]['publicid']
+        assert parser[section_id].metadata['toplongitude'] == \
+            hydjson['sections'][0]['toplongitude']
+
 
 class TestSectionHydraulics:
     def test_metadata(self):
@@ -64,17 +144,127 @@ class TestSectionHydraulics:
         del metadata['publicid']
         assert hydraulics.metadata == metadata
 
+    def test_empty_to_json(self):
+        hydraulics = SectionHydraulics()
+        hydraulics_json = hydraulics.to_json()
+        assert hydraulics_json['hydraulics'] == []
+        assert hydraulics_json['publicid'] == \
+            str(hydraulics.metadata['publicid'])
+
     def test_load_hydraulic_dataframe(self, df):
         hydraulics = SectionHydraulics()
         hydraulics.hydraulics = df
         pd.testing.assert_frame_equal(hydraulics.hydraulics, df)
 
+    def test_load_invalid_dataframe(self, df):
+        hydraulics = SectionHydraulics()
+        with pytest.raises(KeyError, match='unknown'):
+            hydraulics.hydraulics = df.assign(unknown=1.0)
+
+    def test_load_unsorted_dataframe(self, df):
+        hydraulics = SectionHydraulics()
+        hydraulics.hydraulics = df.iloc[::-1].copy()
+        pd.testing.assert_frame_equal(hydraulics.hydraulics, df)
+
     def test_load_hydraulic_json(self, hydjson, df):
         hydraulics = SectionHydraulics()
         hydraulics.load_hydraulic_json(
             hydjson['sections'][1]['hydraulics'])
         pd.testing.assert_frame_equal(hydraulics.hydraulics, df)
 
+    def test_load_hydraulic_bytes(self, hydjson, df):
+        data = json.dumps(hydjson['sections'][1]['hydraulics']).encode()
+        pd.testing.assert_frame_equal(
+            SectionHydraulics._load_hydraulic_bytes(data), df)
+
+    def test_load_hydraulic_json_sparse(self):
+        samples = [
+            {'datetime': {'value': '2021-01-01T00:00:00'},
+             'topflow': {'value': 1.0}},
+            {'datetime': {'value': '2021-01-01T00:00:01'},
+             'toppressure': {'value': 2.0}}]
+        hydraulics = SectionHydraulics()
+        hydraulics.load_hydraulic_json(samples)
+
+        assert list(hydraulics.hydraulics.columns) == \
+            ['topflow', 'toppressure']
+        assert hydraulics.hydraulics['topflow'].isna().tolist() == \
+            [False, True]
+        assert hydraulics.to_json()['hydraulics'] == samples
+
+    def test_load_hydraulic_json_mixed_offsets(self):
+        samples = [
+            {'datetime': {'value': '2021-03-27T12:00:00+01:00'},
+             'topflow': {'value': 1.0}},
+            {'datetime': {'value': '2021-03-28T12:00:00+02:00'},
+             'topflow': {'value': 2.0}}]
+        hydraulics = SectionHydraulics()
+        hydraulics.load_hydraulic_json(samples)
+
+        assert hydraulics.hydraulics.index.tolist() == [
+            pd.Timestamp('2021-03-27T11:00:00', tz='UTC'),
+            pd.Timestamp('2021-03-28T10:00:00', tz='UTC')]
+        assert hydraulics.hydraulics['topflow'].tolist() == [1.0, 2.0]
+
+    def test_to_json_repeated_columns(self):
+        index = pd.date_range('2021-01-01', periods=2, freq='s')
+        hydraulics = SectionHydraulics()
+        hydraulics.hydraulics = pd.concat(
+            [pd.Series([1.0, None], index=index, name='topflow'),
+             pd.Series([None, 2.0], index=index, name='topflow')], axis=1)
+
+        assert [s['topflow']['value']
+                for s in hydraulics.to_json()['hydraulics']] == [1.0, 2.0]
+
+    def test_load_hydraulic_json_dtype(self, hydjson, df):
+        hydraulics = SectionHydraulics()
+        hydraulics.load_hydraulic_json(
+            hydjson['sections'][1]['hydraulics'], dtype='float32')
+
+        assert (hydraulics.hydraulics.dtypes == 'float32').all()
+        pd.testing.assert_frame_equal(
+            hydraulics.hydraulics, df.astype('float32'))
+
+    def test_batch_from_json(self, hydjson):
+        sparse = empty_section_metadata()
+        sparse['hydraulics'] = [
+            {'datetime': {'value': '2021-01-01T00:00:00'},
+             'topflow': {'value': 1.0}}]
+        data = hydjson['sections'] + [sparse]
+
+        expected = [SectionHydraulics(deepcopy(s)) for s in data]
+        sections = SectionHydraulics.batch_from_json(data)
+
+        assert len(sections) == len(expected)
+        for section, other in zip(sections, expected):
+            assert section.metadata == other.metadata
+            pd.testing.assert_frame_equal(section.hydraulics,
+                                          other.hydraulics)
+
+    def test_batch_from_json_mixed_offsets(self):
+        data = []
+        for datetimes in (['2021-03-27T12:00:00+01:00'],
+                          ['2021-03-28T12:00:00+02:00'],
+                          ['2021-03-29T12:00:00'],
+                          ['2021-03-27T12:00:00+01:00',
+                           '2021-03-28T12:00:00+02:00']):
+            section = empty_section_metadata()
+            section['hydraulics'] = [{'datetime': {'value': v},
+                                      'topflow': {'value': 1.0}}
+                                     for v in datetimes]
+            data.append(section)
+
+        expected = [SectionHydraulics(deepcopy(s)) for s in data]
+        sections = SectionHydraulics.batch_from_json(data)
+
+        for section, other in zip(sections, expected):
+            pd.testing.assert_frame_equal(section.hydraulics,
+                                          other.hydraulics)
+
+        hydjson = BoreholeHydraulics().to_json()
+        hydjson['sections'] = data
+        assert len(BoreholeHydraulics(hydjson)) == len(data)
+
     def test_load_section_json(self, hydjson, df, metadata):
         hydraulics = SectionHydraulics()
 
@@ -87,6 +277,51 @@ class TestSectionHydraulics:
         pd.testing.assert_frame_equal(hydraulics.hydraulics, df)
         assert hydraulics.metadata == metadata
 
+    def test_to_json_after_index_change(self, hydjson):
+        hydraulics = SectionHydraulics(hydjson['sections'][1])
+        hydraulics.to_json()
+
+        hydraulics.hydraulics.index = \
+            hydraulics.hydraulics.index + pd.Timedelta(seconds=1)
+        samples = hydraulics.to_json()['hydraulics']
+
+        assert samples[0]['datetime']['value'] == \
+            hydraulics.hydraulics.index[0].strftime('%Y-%m-%dT%H:%M:%S')
+
+    def test_query_datetime(self, df):
+        hydraulics = SectionHydraulics()
+        hydraulics.hydraulics = df
+        starttime = df.index[2].to_pydatetime()
+        endtime = df.index[5].to_pydatetime()
+
+        queried = hydraulics.query_datetime(starttime, endtime)
+        pd.testing.assert_frame_equal(queried.hydraulics, df.iloc[2:6])
+        assert queried.metadata == hydraulics.metadata
+
+        queried = hydraulics.query_datetime(starttime=starttime)
+        pd.testing.assert_frame_equal(queried.hydraulics, df.iloc[2:])
+
+        queried = hydraulics.query_datetime(endtime=endtime)
+        pd.testing.assert_frame_equal(queried.hydraulics, df.iloc[:6])
+
+        empty = SectionHydraulics()
+        empty.hydraulics = pd.DataFrame()
+        assert empty.query_datetime(starttime, endtime).hydraulics.empty
+
+    def test_query_datetime_copies(self, df):
+        hydraulics = SectionHydraulics()
+        hydraulics.hydraulics = df.copy()
+
+        queried = hydraulics.query_datetime(df.index[2], df.index[5])
+        queried.hydraulics.iloc[0, 0] = -999.0
+
+        pd.testing.assert_frame_equal(hydraulics.hydraulics, df)
+
+        empty = SectionHydraulics()
+        empty.hydraulics = pd.DataFrame()
+        queried = empty.query_datetime(df.index[2], df.index[5])
+        assert queried.hydraulics is not empty.hydraulics
+
     def test_to_json(self, hydjson, df):
         hydraulics = SectionHydraulics(hydjson['sections'][1])
         hydraulics_json = hydraulics.to_json()
@@ -0,0 +1,367 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from hydws.coordinates import CoordinateTransformer
+from hydws.parser.rawparser import (RawHydraulicsParser, _not_null,
+                                    calculate_coords,
+                                    calculate_section_trajectories,
+                                    hydws_metadata_from_configs)
+
+COLS = ['depth', 'x', 'y', 'z']
+ORIGIN = [2679720.70, 1151600.13, 1485.0]
+
+BOREHOLES_CSV = """name,publicid,x,y,z,measureddepth,description
+BH0,6bc1c5a2-5b2a-4c43-9b68-0d3c2f9d6b11,0.0,0.0,0.0,100.0,
+ST1,29a3a2d8-b5d3-4dd6-bc12-0892874723fc,100.0,200.0,-300.0,400.0,test
+"""
+
+SECTIONS_CSV = """borehole_name,name,publicid,topclosed,bottomclosed,\
+topmeasureddepth,bottommeasureddepth,holediameter
+ST1,ST1_section_01,f4bfa3dd-d363-4d92-b294-80b69c165ba4,True,True,\
+10.0,20.0,0.2
+ST1,ST1_section_02,c0c71ae8-e37a-4ad1-9e91-0407cf0792b1,True,True,\
+20.0,30.0,
+BH0,BH0_section_01,a0c71ae8-e37a-4ad1-9e91-0407cf0792b1,True,True,\
+0.0,5.0,
+"""
+
+
+@pytest.fixture
+def config_paths(tmp_path):
+    boreholes_path = tmp_path / 'boreholes.csv'
+    sections_path = tmp_path / 'sections.csv'
+    boreholes_path.write_text(BOREHOLES_CSV)
+    sections_path.write_text(SECTIONS_CSV)
+    return str(boreholes_path), str(sections_path)
+
+
+@pytest.fixture
+def trajectory():
+    return pd.DataFrame({'depth': [0., 10., 20., 30.],
+                         'x': [0., 1., 3., 6.],
+                         'y': [0., -1., -2., -3.],
+                         'z': [0., -10., -19., -27.]})
+
+
+@pytest.mark.parametrize('value', [
+    None, float('nan'), np.float64('nan'), pd.NaT, pd.NA,
+    0.0, np.float64(1.5), 1, 'text', True])
+def test_not_null(value):
+    assert _not_null(value) == pd.notnull(value)
+
+
+def test_calculate_coords_exact(trajectory):
+    assert calculate_coords(20., trajectory, COLS) == (3., -2., -19.)
+
+
+def test_calculate_coords_interpolate(trajectory):
+    x, y, z = calculate_coords(12.5, trajectory, COLS)
+    assert x == pytest.approx(1.5)
+    assert y == pytest.approx(-1.25)
+    assert z == pytest.approx(-12.25)
+
+    x, y, z = calculate_coords(17.5, trajectory, COLS)
+    assert x == pytest.approx(2.5)
+    assert y == pytest.approx(-1.75)
+    assert z == pytest.approx(-16.75)
+
+
+def test_calculate_coords_bracketing():
+    # unevenly spaced and unsorted, the closest points of 9 are 10 and 11
+    trajectory = pd.DataFrame({'depth': [11., 0., 10.],
+                               'x': [30., 0., 10.],
+                               'y': [0., 0., 0.],
+                               'z': [-11., 0., -10.]})
+
+    assert calculate_coords(9., trajectory, COLS) == \
+        pytest.approx((9., 0., -9.))
+    assert calculate_coords(12., trajectory, COLS) == \
+        pytest.approx((50., 0., -12.))
+    assert calculate_coords(-1., trajectory, COLS) == \
+        pytest.approx((-1., 0., 1.))
+
+
+def test_hydws_metadata_from_configs(config_paths):
+    borehole = hydws_metadata_from_configs(
+        'ST1', *config_paths, ORIGIN, 'epsg:2056')
+
+    sections = borehole.pop('sections')
+    assert borehole == {
+        'name': 'ST1',
+        'publicid': '29a3a2d8-b5d3-4dd6-bc12-0892874723fc',
+        'description': 'test',
+        'measureddepth': {'value': 400.0},
+        'longitude': {'value': pytest.approx(8.478713809107877)},
+        'latitude': {'value': pytest.approx(46.5127500611254)},
+        'altitude': {'value': -300.0}}
+    assert sections == [
+        {'name': 'ST1_section_01',
+         'publicid': 'f4bfa3dd-d363-4d92-b294-80b69c165ba4',
+         'topclosed': True,
+         'bottomclosed': True,
+         'topmeasureddepth': {'value': 10.0},
+         'bottommeasureddepth': {'value': 20.0},
+         'holediameter': {'value': 0.2}},
+        {'name': 'ST1_section_02',
+         'publicid': 'c0c71ae8-e37a-4ad1-9e91-0407cf0792b1',
+         'topclosed': True,
+         'bottomclosed': True,
+         'topmeasureddepth': {'value': 20.0},
+         'bottommeasureddepth': {'value': 30.0}}]
+
+    borehole = hydws_metadata_from_configs(
+        'BH0', *config_paths, ORIGIN, 'epsg:2056')
+    assert 'description' not in borehole
+    assert [s['name'] for s in borehole['sections']] == ['BH0_section_01']
+
+
+def test_hydws_metadata_from_dataframes(config_paths):
+    boreholes_path, sections_path = config_paths
+    boreholes_csv = pd.read_csv(boreholes_path)
+    sections_csv = pd.read_csv(sections_path)
+
+    for name in ['BH0', 'ST1']:
+        assert hydws_metadata_from_configs(
+            name, boreholes_csv, sections_csv, ORIGIN, 'epsg:2056') == \
+            hydws_metadata_from_configs(
+                name, *config_paths, ORIGIN, 'epsg:2056')
+
+    pd.testing.assert_frame_equal(boreholes_csv,
+                                  pd.read_csv(boreholes_path))
+    pd.testing.assert_frame_equal(sections_csv, pd.read_csv(sections_path))
+
+
+def test_calculate_section_trajectories(config_paths, trajectory, tmp_path):
+    trajectory_path = tmp_path / 'trajectory.csv'
+    trajectory.to_csv(trajectory_path)
+
+    borehole = hydws_metadata_from_configs(
+        'ST1', *config_paths, ORIGIN, 'epsg:2056')
+    borehole = calculate_section_trajectories(
+        borehole, str(trajectory_path), ORIGIN, 'epsg:2056')
+
+    transformer = CoordinateTransformer('epsg:2056', ORIGIN[0], ORIGIN[1])
+    expected = {10.: transformer.from_local_coords(1., -1., -10.),
+                20.: transformer.from_local_coords(3., -2., -19.),
+                30.: transformer.from_local_coords(6., -3., -27.)}
+
+    assert calculate_section_trajectories(
+        hydws_metadata_from_configs(
+            'ST1', *config_paths, ORIGIN, 'epsg:2056'),
+        trajectory, ORIGIN, 'epsg:2056') == borehole
+
+    for section in borehole['sections']:
+        for field in ['top', 'bottom']:
+            lon, lat, alt = \
+                expected[section[f'{field}measureddepth']['value']]
+            assert section[f'{field}longitude']['value'] == \
+                pytest.approx(lon)
+            assert section[f'{field}latitude']['value'] == \
+                pytest.approx(lat)
+            assert section[f'{field}altitude']['value'] == \
+                pytest.approx(alt)
+
+
+def _section(name, publicid, bottomaltitude):
+    return {'publicid': publicid,
+            'name': name,
+            'toplongitude': {'value': 8.0},
+            'toplatitude': {'value': 46.0},
+            'topaltitude': {'value': 0.0},
+            'bottomlongitude': {'value': 8.0},
+            'bottomlatitude': {'value': 46.0},
+            'bottomaltitude': {'value': bottomaltitude},
+            'topclosed': True,
+            'bottomclosed': True}
+
+
+@pytest.fixture
+def boreholes_metadata():
+    return [{'publicid': '6bc1c5a2-5b2a-4c43-9b68-0d3c2f9d6b11',
+             'name': 'BH0',
+             'longitude': {'value': 8.0},
+             'latitude': {'value': 46.0},
+             'altitude': {'value': 100.0},
+             'sections': [
+                 _section('S1', 'f4bfa3dd-d363-4d92-b294-80b69c165ba4',
+                          -100.0),
+                 _section('S2', 'c0c71ae8-e37a-4ad1-9e91-0407cf0792b1',
+                          -200.0)]}]
+
+
+@pytest.fixture
+def raw_config(tmp_path):
+    plan_path = tmp_path / 'plan.csv'
+    plan_path.write_text(
+        'interval,date_from,date_until\n'
+        'S1,2021/01/01T00:00:00,2021/01/01T00:01:00\n'
+        'S2,2021/01/01T00:02:00,2021/01/01T00:03:00\n')
+
+    config = [
+        {'columnNames': ['flow_a', 'flow_b'],
+         'fieldName': 'topflow',
+         'assignTo': 'sectionID',
+         'section': 'S1',
+         'unitConversion': ['mul', 2]},
+        {'columnNames': ['pressure'],
+         'fieldName': 'toppressure',
+         'assignTo': 'sectionID',
+         'section': 'S1',
+         'sensorPosition': 'surface'},
+        {'columnNames': ['temperature', 'temperature_b'],
+         'fieldName': 'toptemperature',
+         'assignTo': 'sectionID',
+         'section': 'S2',
+         'conditions': [{'columnNames': ['temperature_b'],
+                         'rule': 'above',
+                         'value': 10}]},
+        {'columnNames': ['pressure_b'],
+         'fieldName': 'bottompressure',
+         'assignTo': 'plan',
+         'section': str(plan_path)},
+        {'columnNames': ['missing'],
+         'fieldName': 'bottomflow',
+         'assignTo': 'sectionID',
+         'section': 'S2'}]
+
+    config_path = tmp_path / 'config.json'
+    config_path.write_text(json.dumps(config))
+    return str(config_path)
+
+
+@pytest.fixture
+def raw_data():
+    index = pd.date_range('2021-01-01', periods=4, freq='min')
+    return pd.DataFrame({'flow_a': [1.0, 2.0, 3.0, 4.0],
+                         'flow_b': [0.5, 0.5, 0.5, 0.5],
+                         'pressure': [1.0, 2.0, 3.0, 4.0],
+                         'temperature': [1.0, 1.0, 1.0, 1.0],
+                         'temperature_b': [5.0, 20.0, 30.0, 5.0],
+                         'pressure_b': [10.0, 20.0, 30.0, 40.0]},
+                        index=index)
+
+
+class TestRawHydraulicsParser:
+    def test_parse(self, raw_config, boreholes_metadata, raw_data):
+        parser = RawHydraulicsParser(raw_config, boreholes_metadata)
+        boreholes = parser.parse(raw_data, format='hydwsparser')
+
+        borehole = boreholes['6bc1c5a2-5b2a-4c43-9b68-0d3c2f9d6b11']
+        index = raw_data.index
+
+        surface = 998.2 * 200.0 * 9.81
+        expected = pd.DataFrame(
+            {'topflow': [3.0, 5.0, 7.0, 9.0],
+             'toppressure': [1.0 + surface, 2.0 + surface,
+                             3.0 + surface, 4.0 + surface],
+             'bottompressure': [10.0, 20.0, None, None]},
+            index=index)
+        pd.testing.assert_frame_equal(
+            borehole.nloc['S1'].hydraulics, expected, check_freq=False)
+
+        expected = pd.DataFrame(
+            {'toptemperature': [0.0, 20.0, 30.0, 0.0],
+             'bottompressure': [None, None, 30.0, 40.0]},
+            index=index)
+        pd.testing.assert_frame_equal(
+            borehole.nloc['S2'].hydraulics, expected, check_freq=False)
+
+    def test_parse_json(self, raw_config, boreholes_metadata, raw_data):
+        parser = RawHydraulicsParser(raw_config, boreholes_metadata)
+        boreholes = parser.parse(raw_data)
+
+        assert len(boreholes) == 1
+        sections = {s['name']: s for s in boreholes[0]['sections']}
+        assert sections['S1']['hydraulics'][0] == {
+            'topflow': {'value': 3.0},
+            'toppressure': {'value': 1.0 + 998.2 * 200.0 * 9.81},
+            'bottompressure': {'value': 10.0},
+            'datetime': {'value': '2021-01-01T00:00:00'}}
+        assert sections['S2']['hydraulics'][3] == {
+            'toptemperature': {'value': 0.0},
+            'bottompressure': {'value': 40.0},
+            'datetime': {'value': '2021-01-01T00:03:00'}}
+
+    def test_apply_conditions(self, raw_config, boreholes_metadata):
+        parser = RawHydraulicsParser(raw_config, boreholes_metadata)
+        df = pd.DataFrame({'a': [1., 5., None, 2.],
+                           'b': [3., 1., 4., None]})
+        config = {'columnNames': ['a', 'b'],
+                  'conditions': [
+                      {'columnNames': ['a'], 'rule': 'above', 'value': 2},
+                      {'columnNames': ['b'], 'rule': 'above-current',
+                       'value': 0},
+                      {'columnNames': ['a', 'b'], 'rule': 'below-current',
+                       'value': -1.5},
+                      {'columnNames': ['b'], 'rule': 'below', 'value': 2}]}
+
+        result = parser._apply_conditions(config, df)
+        pd.testing.assert_series_equal(
+            result, pd.Series([4., 1., 4., 0.], index=df.index))
+
+        result = parser._apply_conditions(
+            config, pd.DataFrame({'a': [1, 5], 'b': [3, 1]}))
+        pd.testing.assert_series_equal(result, pd.Series([4, 1]))
+
+        config['conditions'][0]['rule'] = 'between'
+        with pytest.raises(ValueError):
+            parser._apply_conditions(config, df)
+
+    def test_parse_overlapping_plan(self, tmp_path, boreholes_metadata,
+                                    raw_data):
+        plan_path = tmp_path / 'plan.csv'
+        plan_path.write_text(
+            'interval,date_from,date_until\n'
+            'S1,2021/01/01T00:00:00,2021/01/01T00:02:00\n'
+            'S2,2021/01/01T00:02:00,2021/01/01T00:10:00\n')
+        config_path = tmp_path / 'config.json'
+        config_path.write_text(json.dumps([
+            {'columnNames': ['pressure_b'],
+             'fieldName': 'bottompressure',
+             'assignTo': 'plan',
+             'section': str(plan_path)}]))
+
+        parser = RawHydraulicsParser(str(config_path), boreholes_metadata)
+        borehole = parser.parse(raw_data, format='hydwsparser')[
+            '6bc1c5a2-5b2a-4c43-9b68-0d3c2f9d6b11']
+
+        assert borehole.nloc['S1'].hydraulics['bottompressure'].tolist() \
+            == [10.0, 20.0, 30.0]
+        assert borehole.nloc['S2'].hydraulics['bottompressure'].tolist() \
+            == [30.0, 40.0]
+
+    def test_parse_repeated_plan_interval(self, tmp_path,
+                                          boreholes_metadata, raw_data):
+        plan_path = tmp_path / 'plan.csv'
+        plan_path.write_text(
+            'interval,date_from,date_until\n'
+            'S1,2021/01/01T00:00:00,2021/01/01T00:00:00\n'
+            'S2,2021/01/01T00:01:00,2021/01/01T00:02:00\n'
+            'S1,2021/01/01T00:03:00,2021/01/01T00:03:00\n')
+        config_path = tmp_path / 'config.json'
+        config_path.write_text(json.dumps([
+            {'columnNames': ['pressure_b'],
+             'fieldName': 'bottompressure',
+             'assignTo': 'plan',
+             'section': str(plan_path)}]))
+
+        parser = RawHydraulicsParser(str(config_path), boreholes_metadata)
+        borehole = parser.parse(raw_data, format='hydwsparser')[
+            '6bc1c5a2-5b2a-4c43-9b68-0d3c2f9d6b11']
+
+        hydraulics = borehole.nloc['S1'].hydraulics
+        assert list(hydraulics.columns) == ['bottompressure']
+        assert hydraulics['bottompressure'].tolist() == [10.0, 40.0]
+
+        samples = borehole.nloc['S1'].to_json()['hydraulics']
+        assert [s['bottompressure']['value'] for s in samples] == \
+            [10.0, 40.0]
+
+    def test_parse_unknown_format(self, raw_config, boreholes_metadata,
+                                  raw_data):
+        parser = RawHydraulicsParser(raw_config, boreholes_metadata)
+        with pytest.raises(KeyError):
+            parser.parse(raw_data, format='csv')
@@ -0,0 +1,27 @@
+import gzip
+
+import pytest
+import requests
+import responses
+
+from hydws import NoContent, binary_request
+
+URL = 'http://hydws.test/hydws/v1/boreholes'
+
+
+@responses.activate
+def test_binary_request():
+    responses.get(URL, body=gzip.compress(b'[1, 2, 3]'),
+                  headers={'Content-Encoding': 'gzip'})
+
+    with binary_request(requests.get, URL) as raw:
+        assert raw.read() == b'[1, 2, 3]'
+
+
+@responses.activate
+def test_binary_request_nocontent():
+    responses.get(URL, status=204)
+
+    with pytest.raises(NoContent):
+        with binary_request(requests.get, URL):
+            pass